@@ -1,13 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import numpy as np
+from numba import njit
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="$SVPERIOR: Tokenomics Simulator", layout="wide")
 
 # --- CUSTOM CSS ---
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .reportview-container { background: #0e1117; }
     .sidebar .sidebar-content { background: #262730; }
@@ -40,68 +42,82 @@ st.markdown("""
         display: none !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+# Emitted on every rerun: Streamlit drops elements a rerun doesn't re-send, so guarding this
+# behind a session flag would strip the styling after the first interaction
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # --- SIDEBAR CONTROLS ---
 st.sidebar.image("https://www.svperior.com/wp-content/uploads/2025/07/Svperior-Logomark.png", width=150)
 st.sidebar.header("Simulation Parameters")
 
-st.sidebar.subheader("1. Protocol Growth")
-initial_aum = st.sidebar.number_input("New AUM Added Per Month ($M)", value=10, step=50)
-monthly_growth = st.sidebar.slider("Monthly AUM Growth Rate (%)", 0, 20, 1)
+# Widgets live in a form so dragging a slider doesn't rerun the whole app on every tick
+with st.sidebar.form("params"):
+    st.subheader("1. Protocol Growth")
+    initial_aum = st.number_input("New AUM Added Per Month ($M)", value=10, step=50)
+    monthly_growth = st.slider("Monthly AUM Growth Rate (%)", 0, 20, 1)
 
-st.sidebar.subheader("2. Token Mechanics")
-initial_supply = st.sidebar.number_input("Initial Token Supply", value=100000000, step=1000000, format="%d")
-fee_bps = st.sidebar.slider("Protocol Fee (Basis Points)", 5, 150, 25)
-burn_pct = st.sidebar.slider("Burn Rate (%)", 0, 100, 50)
-initial_price = st.sidebar.number_input("Starting Token Price ($)", value=0.50, step=0.10)
+    st.subheader("2. Token Mechanics")
+    initial_supply = st.number_input("Initial Token Supply", value=100000000, step=1000000, format="%d")
+    fee_bps = st.slider("Protocol Fee (Basis Points)", 5, 150, 25)
+    burn_pct = st.slider("Burn Rate (%)", 0, 100, 50)
+    initial_price = st.number_input("Starting Token Price ($)", value=0.50, step=0.10)
 
-st.sidebar.subheader("3. Market Depth")
-liquidity_depth = st.sidebar.number_input(
-    "Buy Pressure for 1% Move ($)", 
-    value=500000, 
-    step=50000, 
-    format="%d",
-    help="On Uniswap (DeFi) or a mid-tier exchange (like Bybit...), the 'Liquidity Pool' usually holds about $5M - $10M worth of tokens. Mathematically, in a pool of that size, a $50k - $250k buy order is usually enough to shift the price by ~1%."
-)
+    st.subheader("3. Market Depth")
+    liquidity_depth = st.number_input(
+        "Buy Pressure for 1% Move ($)", 
+        value=500000, 
+        step=50000, 
+        format="%d",
+        help="On Uniswap (DeFi) or a mid-tier exchange (like Bybit...), the 'Liquidity Pool' usually holds about $5M - $10M worth of tokens. Mathematically, in a pool of that size, a $50k - $250k buy order is usually enough to shift the price by ~1%."
+    )
 
-st.sidebar.markdown("---")
-st.sidebar.subheader("Your Portfolio")
-user_tokens = st.sidebar.number_input("Tokens You Own", value=1000000, step=100000, format="%d")
+    st.markdown("---")
+    st.subheader("Your Portfolio")
+    user_tokens = st.number_input("Tokens You Own", value=1000000, step=100000, format="%d")
+
+    st.form_submit_button("Run Simulation")
 
 # --- SIMULATION LOGIC ---
-def run_simulation():
-    months = 24
+# Output columns and their dtypes, so pandas never has to infer them.
+# Values stay float64: float32's ~7 significant digits visibly change the whole-dollar and
+# whole-token figures the table shows. Month fits comfortably in int32.
+SIM_COLUMNS = [
+    ("Month", np.int32),
+    ("Total AUM ($)", np.float64),
+    ("New AUM ($)", np.float64),
+    ("Revenue ($)", np.float64),
+    ("Token Price ($)", np.float64),
+    ("Supply", np.float64),
+    ("TTV ($)", np.float64),
+    ("Tokens Burned", np.float64),
+    ("Market Depth ($)", np.float64),
+    ("Your Portfolio Value ($)", np.float64),
+]
+
+CRITICAL_SUPPLY_THRESHOLD = 1_000_000.0  # 1M tokens
+
+def _sim_kernel(revenue_usd, initial_supply, initial_price, burn_pct, liquidity_depth, months):
+    # Price and supply feed into each other, so they still need a month-by-month loop
+    price_col = np.empty(months, dtype=np.float64)
+    supply_col = np.empty(months, dtype=np.float64)
+    burned_col = np.empty(months, dtype=np.float64)
+    depth_col = np.empty(months, dtype=np.float64)
+    
     current_supply = initial_supply
     current_price = initial_price
+    burn_frac = burn_pct * 0.01
     
-    # Convert inputs
-    fee_rate = fee_bps / 10000
-    
-    data = []
-    
-    # Track total AUM
-    total_aum = 0
-    # Current Monthly New AUM
-    monthly_new_aum = initial_aum * 1_000_000 
-    
-    for i in range(1, months + 1):
-        # Add new AUM to total
-        total_aum += monthly_new_aum
-        
-        # 1. Revenue (based on new AUM only)
-        revenue_usd = monthly_new_aum * fee_rate
-        
+    for i in range(months):
         # 2. Tokens Bought & Burned
-        tokens_bought = revenue_usd / current_price
-        tokens_burned = tokens_bought * (burn_pct / 100)
+        tokens_bought = revenue_usd[i] / current_price
+        tokens_burned = tokens_bought * burn_frac
         
-        # Circuit Breaker: If supply is critically low, reduce burn to microscopic amounts
-        CRITICAL_SUPPLY_THRESHOLD = 1_000_000  # 1M tokens
+        # Circuit Breaker: If supply is critically low, reduce burn to microscopic amounts.
+        # Rarely taken, so the common path only pays for the comparison.
         if current_supply < CRITICAL_SUPPLY_THRESHOLD:
             # As supply approaches zero, price goes to infinity, so burn becomes microscopic
-            supply_factor = current_supply / CRITICAL_SUPPLY_THRESHOLD
-            tokens_burned = tokens_burned * supply_factor * 0.01  # Reduce burn by 99%+ when critical
+            tokens_burned *= (current_supply / CRITICAL_SUPPLY_THRESHOLD) * 0.01  # Reduce burn by 99%+ when critical
         
         # 3. Price Impact Logic
         current_mcap = current_supply * current_price
@@ -109,149 +125,201 @@ def run_simulation():
         # Base liquidity + 1% of market cap as available depth
         dynamic_depth = liquidity_depth + (current_mcap * 0.01)
         
-        price_move_pct = revenue_usd / dynamic_depth
+        price_move_pct = revenue_usd[i] / dynamic_depth
         current_price = current_price * (1 + price_move_pct)
         
         # 4. Update Supply with guardrails
         current_supply -= tokens_burned
-        current_supply = max(0, current_supply)  # Supply can never go negative
-        
-        # 5. Growth for next month
-        monthly_new_aum = monthly_new_aum * (1 + (monthly_growth / 100))
+        if current_supply < 0.0:  # Supply can never go negative
+            current_supply = 0.0
         
-        # 6. Portfolio Value
-        portfolio_value = user_tokens * current_price
-        
-        # 7. Total Token Value (Market Cap)
-        total_token_value = current_supply * current_price
-        
-        data.append({
-            "Month": i,
-            "Total AUM ($)": total_aum,
-            "New AUM ($)": monthly_new_aum,
-            "Revenue ($)": revenue_usd,
-            "Token Price ($)": current_price,
-            "Supply": current_supply,
-            "TTV ($)": total_token_value,
-            "Tokens Burned": tokens_burned,
-            "Market Depth ($)": dynamic_depth,
-            "Your Portfolio Value ($)": portfolio_value
-        })
-        
-    return pd.DataFrame(data)
+        price_col[i] = current_price
+        supply_col[i] = current_supply
+        burned_col[i] = tokens_burned
+        depth_col[i] = dynamic_depth
+    
+    return price_col, supply_col, burned_col, depth_col
 
-df = run_simulation()
+@st.cache_resource(show_spinner=False)
+def _compiled_sim_kernel():
+    # Streamlit re-executes this script on every rerun, so a module-level @njit would hand back a
+    # fresh dispatcher (and reload the kernel) each time; keep one compiled kernel per process.
+    # Restart the server after editing the kernel.
+    # fastmath is limited to flags that keep inf/nan semantics for runaway parameter combinations.
+    # The explicit signature compiles the one specialization up front and rejects anything else.
+    return njit(
+        "(float64[::1], float64, float64, float64, float64, int64)",
+        cache=True, fastmath={"reassoc", "contract", "arcp"}, boundscheck=False
+    )(_sim_kernel)
+
+def portfolio_metrics(user_tokens, initial_price, final_price):
+    start_port_value = user_tokens * initial_price
+    final_port_value = user_tokens * final_price
+    roi_pct = ((final_port_value - start_port_value) / start_port_value) * 100
+    return {
+        "start_port_value": f"${start_port_value:,.0f}",
+        "final_port_value": f"${final_port_value:,.0f}",
+        "roi_pct": f"+{roi_pct:,.0f}%"
+    }
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def run_simulation(initial_aum, monthly_growth, initial_supply, fee_bps, burn_pct,
+                   initial_price, liquidity_depth, user_tokens, months=24):
+    # Convert inputs
+    fee_rate = fee_bps * 1e-4
+    growth_factor = 1.0 + monthly_growth * 0.01
+    
+    # AUM and revenue only depend on the growth rate, so build them in one shot.
+    # Closed-form powers also avoid the rounding drift of compounding month by month.
+    month_idx = np.arange(1, months + 1)
+    # Current Monthly New AUM (before that month's growth is applied)
+    monthly_new_aum = (initial_aum * 1_000_000.0) * growth_factor ** np.arange(months, dtype=np.float64)
+    # Track total AUM
+    total_aum = np.cumsum(monthly_new_aum)
+    # 1. Revenue (based on new AUM only)
+    revenue_usd = monthly_new_aum * fee_rate
+    
+    # Cast to float so the compiled kernel only ever sees one signature
+    price_col, supply_col, burned_col, depth_col = _compiled_sim_kernel()(
+        revenue_usd, float(initial_supply), float(initial_price),
+        float(burn_pct), float(liquidity_depth), months
+    )
+    
+    rec = np.empty(months, dtype=SIM_COLUMNS)
+    rec["Month"] = month_idx
+    rec["Total AUM ($)"] = total_aum
+    # Reported after the growth for next month has been applied
+    rec["New AUM ($)"] = monthly_new_aum * growth_factor
+    rec["Revenue ($)"] = revenue_usd
+    rec["Token Price ($)"] = price_col
+    rec["Supply"] = supply_col
+    rec["Tokens Burned"] = burned_col
+    rec["Market Depth ($)"] = depth_col
+    
+    # 5. Portfolio Value
+    rec["Your Portfolio Value ($)"] = user_tokens * price_col
+    
+    # 6. Total Token Value (Market Cap)
+    rec["TTV ($)"] = supply_col * price_col
+    
+    # Top Level Metrics, formatted here so a cache hit skips them too
+    final_price = price_col[-1]
+    metrics = {
+        # Kept unformatted so the portfolio metrics can be redone without rerunning the sim
+        "final_price_value": final_price,
+        "final_price": f"${final_price:,.2f}",
+        "ending_supply": f"{supply_col[-1]:,.0f}",
+        **portfolio_metrics(user_tokens, initial_price, final_price)
+    }
+    
+    return pd.DataFrame.from_records(rec), metrics
+
+# --- CHART BUILDERS ---
+# Shared chart styling, applied once per figure
+BASE_LAYOUT = dict(
+    margin=dict(l=0, r=0, t=0, b=0),
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    showlegend=False
+)
+AXIS_STYLE = dict(gridcolor='#333')
+
+# One entry per dashboard panel: (row, col, title, DataFrame column, trace name, color, y-axis title, fill)
+DASHBOARD_PANELS = (
+    (1, 1, "Total AUM", "Total AUM ($)", "Total AUM", '#F59E0B', "Total AUM ($)", 'tozeroy'),
+    (1, 2, "Required Liquidity for 1% Move", "Market Depth ($)", "Market Depth", '#8B5CF6', "Market Depth ($)", 'tozeroy'),
+)
+
+@st.cache_resource(show_spinner=False, max_entries=128)
+def build_dashboard_fig(sim_params, _df):
+    # These panels only depend on the market parameters, so the scalar sim_params tuple is the
+    # cache key and the (unhashed) DataFrame just supplies the data. A hit skips the subplot and
+    # trace construction. The figure is shared across sessions, so it must not be mutated.
+    # All panels share one figure so the browser only initializes a single plotly.js chart.
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=[panel[2] for panel in DASHBOARD_PANELS]
+    )
+    x = _df["Month"].to_numpy()
+    for row, col, _, column, name, color, y_title, fill in DASHBOARD_PANELS:
+        fig.add_trace(go.Scatter(
+            x=x,
+            y=_df[column].to_numpy(),
+            fill=fill,
+            line=dict(color=color, width=3),
+            name=name
+        ), row=row, col=col)
+        fig.update_yaxes(title_text=y_title, row=row, col=col)
+    fig.update_xaxes(title_text="Month", **AXIS_STYLE)
+    fig.update_yaxes(**AXIS_STYLE)
+    # Leave room at the top for the subplot titles
+    fig.update_layout(BASE_LAYOUT, margin_t=30)
+    fig.update_annotations(font_color='#F59E0B')
+    return fig
+
+sim_params = (
+    initial_aum, monthly_growth, initial_supply, fee_bps, burn_pct,
+    initial_price, liquidity_depth
+)
+if "sim" not in st.session_state or sim_params != st.session_state.sim_params:
+    st.session_state.sim = run_simulation(*sim_params, user_tokens)
+    st.session_state.sim_params = sim_params
+    st.session_state.sim_user_tokens = user_tokens
+elif user_tokens != st.session_state.sim_user_tokens:
+    # Only the holding changed, which doesn't feed back into the market: rescale the
+    # portfolio column of the previous run instead of simulating again
+    df, metrics = st.session_state.sim
+    df = df.copy()
+    df["Your Portfolio Value ($)"] = user_tokens * df["Token Price ($)"].to_numpy()
+    metrics = {
+        **metrics,
+        **portfolio_metrics(user_tokens, initial_price, metrics["final_price_value"])
+    }
+    st.session_state.sim = (df, metrics)
+    st.session_state.sim_user_tokens = user_tokens
+df, metrics = st.session_state.sim
 
 # --- DASHBOARD LAYOUT ---
 
 st.title("$SVPERIOR: Tokenomics Simulator")
 
 # Top Level Metrics
-final_price = df.iloc[-1]['Token Price ($)']
-start_port_value = user_tokens * initial_price
-final_port_value = user_tokens * final_price
-roi_pct = ((final_port_value - start_port_value) / start_port_value) * 100
-
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("Target Token Price", f"${final_price:,.2f}")
-col2.metric("Ending Supply", f"{df.iloc[-1]['Supply']:,.0f}")
-col3.metric("Your Portfolio Start", f"${start_port_value:,.0f}")
-col4.metric("Your Portfolio End", f"${final_port_value:,.0f}", f"+{roi_pct:,.0f}%")
+col1.metric("Target Token Price", metrics["final_price"])
+col2.metric("Ending Supply", metrics["ending_supply"])
+col3.metric("Your Portfolio Start", metrics["start_port_value"])
+col4.metric("Your Portfolio End", metrics["final_port_value"], metrics["roi_pct"])
 
 st.markdown("---")
 
-# Charts - 3 columns
+# Charts - simple series use Streamlit's native (Vega-Lite) charts, which skip Plotly's
+# Python-side figure construction and ship the data as Arrow
 c1, c2, c3 = st.columns(3)
 
 with c1:
     st.subheader("Token Price")
-    fig_price = go.Figure()
-    fig_price.add_trace(go.Scatter(
-        x=df['Month'], 
-        y=df['Token Price ($)'], 
-        line=dict(color='#00FF94', width=3),
-        name="Price"
-    ))
-    fig_price.update_layout(
-        yaxis=dict(title="Price ($)", gridcolor='#333'),
-        xaxis=dict(title="Month", gridcolor='#333'),
-        margin=dict(l=0, r=0, t=0, b=0),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        showlegend=False
-    )
-    st.plotly_chart(fig_price, use_container_width=True)
+    st.line_chart(df, x="Month", y="Token Price ($)", color='#00FF94', y_label="Price ($)")
 
 with c2:
     st.subheader("Token Supply")
-    fig_supply = go.Figure()
-    fig_supply.add_trace(go.Scatter(
-        x=df['Month'], 
-        y=df['Supply'], 
-        line=dict(color='#D92A1C', width=3),
-        name="Supply"
-    ))
-    fig_supply.update_layout(
-        yaxis=dict(title="Supply", gridcolor='#333'),
-        xaxis=dict(title="Month", gridcolor='#333'),
-        margin=dict(l=0, r=0, t=0, b=0),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        showlegend=False
-    )
-    st.plotly_chart(fig_supply, use_container_width=True)
+    st.line_chart(df, x="Month", y="Supply", color='#D92A1C', y_label="Supply")
 
 with c3:
     st.subheader("Your Portfolio Value")
-    fig_port = go.Figure()
-    fig_port.add_trace(go.Scatter(
-        x=df['Month'], 
-        y=df['Your Portfolio Value ($)'],
-        fill='tozeroy',
-        line=dict(color='#1E90FF', width=3),
-        name="Portfolio Value"
-    ))
-    fig_port.update_layout(
-        yaxis=dict(title="Value ($)", gridcolor='#333'),
-        xaxis=dict(title="Month", gridcolor='#333'),
-        margin=dict(l=0, r=0, t=0, b=0),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        showlegend=False
-    )
-    st.plotly_chart(fig_port, use_container_width=True)
+    st.area_chart(df, x="Month", y="Your Portfolio Value ($)", color='#1E90FF', y_label="Value ($)")
 
-# Data Table
-st.dataframe(df.style.format({
-    "Total AUM ($)": "${:,.0f}",
-    "New AUM ($)": "${:,.0f}",
-    "Revenue ($)": "${:,.0f}",
-    "Token Price ($)": "${:,.2f}",
-    "Supply": "{:,.0f}",
-    "TTV ($)": "${:,.0f}",
-    "Tokens Burned": "{:,.0f}",
-    "Market Depth ($)": "${:,.0f}",
-    "Your Portfolio Value ($)": "${:,.0f}"
-}))
-
-st.subheader("Total Assets Under Management")
-fig_aum = go.Figure()
-fig_aum.add_trace(go.Scatter(
-    x=df['Month'], 
-    y=df['Total AUM ($)'],
-    fill='tozeroy',
-    line=dict(color='#F59E0B', width=3),
-    name="Total AUM"
-))
-fig_aum.update_layout(
-    yaxis=dict(title="Total AUM ($)", gridcolor='#333'),
-    xaxis=dict(title="Month", gridcolor='#333'),
-    margin=dict(l=0, r=0, t=0, b=0),
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=False
-)
-st.plotly_chart(fig_aum, use_container_width=True)
+fig_dashboard = build_dashboard_fig(sim_params, df)
+st.plotly_chart(fig_dashboard, width="stretch")
 
-st.subheader("Required Liquidity for 1% Move")
-st.area_chart(df.set_index('Month')[['Market Depth ($)']])
+# Data Table - formatted in the browser from the Arrow payload instead of a pandas Styler
+st.dataframe(df, column_config={
+    "Total AUM ($)": st.column_config.NumberColumn(format="$%,.0f"),
+    "New AUM ($)": st.column_config.NumberColumn(format="$%,.0f"),
+    "Revenue ($)": st.column_config.NumberColumn(format="$%,.0f"),
+    "Token Price ($)": st.column_config.NumberColumn(format="$%,.2f"),
+    "Supply": st.column_config.NumberColumn(format="%,.0f"),
+    "TTV ($)": st.column_config.NumberColumn(format="$%,.0f"),
+    "Tokens Burned": st.column_config.NumberColumn(format="%,.0f"),
+    "Market Depth ($)": st.column_config.NumberColumn(format="$%,.0f"),
+    "Your Portfolio Value ($)": st.column_config.NumberColumn(format="$%,.0f")
+}, hide_index=True)